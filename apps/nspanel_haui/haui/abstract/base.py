@@ -16,6 +16,8 @@ class HAUIBase:
 
     """ Base class for all Home Assistant UI (HAUI) classes. """
 
+    __slots__ = ("id", "app", "config", "_recording", "_rec_cmd")
+
     def __init__(self, app: hass.Hass, config=None):
         """Initializes a new instance of the HAUIBase class.
 
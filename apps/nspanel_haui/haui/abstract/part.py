@@ -10,6 +10,8 @@ class HAUIPart(HAUIBase):
     Subclasses should override the start and stop methods to provide specific functionality.
     """
 
+    __slots__ = ("_started",)
+
     def __init__(self, app, config=None):
         """ Initialize for HAUIPart.
 
@@ -1,11 +1,56 @@
 import json
 import threading
+import time
+from collections import OrderedDict
 
-from ..mapping.const import ALL_RECV, ALL_CMD
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from ..mapping.const import ALL_RECV, ALL_CMD, ESP_COMMAND
 from ..abstract.part import HAUIPart
 from ..abstract.event import HAUIEvent
 
 
+# use orjson for mqtt payloads if available, fall back to json
+# with a shared compact encoder
+if orjson is not None:
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+    _json_loads = orjson.loads
+else:
+    _json_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    _json_loads = json.loads
+
+# pre-serialized payload prefixes for all known commands
+_CMD_PREFIX = {cmd: f'{{"name":{_json_dumps(cmd)},"value":' for cmd in ALL_CMD}
+
+
+def _encode_cmd(cmd, value):
+    """ Returns the serialized payload for a command.
+
+    Known commands with a scalar value only need the value serialized.
+
+    Args:
+        cmd (str): Command
+        value (): Value for command
+
+    Returns:
+        str: Payload
+    """
+    prefix = _CMD_PREFIX.get(cmd)
+    if prefix is not None and isinstance(value, (str, int, float, bool)):
+        return f"{prefix}{_json_dumps(value)}}}"
+    return _json_dumps({"name": cmd, "value": value})
+
+
+# max number of recently received payloads to remember
+RECV_CACHE_SIZE = 128
+# max length of commands merged into one send_commands message
+SEND_COMMANDS_MAX_LEN = 200
+
+
 class HAUIMQTTController(HAUIPart):
 
     """ MQTT controller
@@ -13,6 +58,26 @@ class HAUIMQTTController(HAUIPart):
     Provides access to MQTT functionality.
     """
 
+    __slots__ = (
+        "mqtt",
+        "prev_cmd",
+        "_publish",
+        "_topic_prefix",
+        "_topic_cmd",
+        "_topic_recv",
+        "_listen_handle",
+        "_event_callback",
+        "_status_topic",
+        "_recv_window",
+        "_recv_cache",
+        "_tx_delay",
+        "_tx_pending",
+        "_tx_handle",
+        "_tx_lock",
+        "_flush_lock",
+        "_debug",
+    )
+
     def __init__(self, app, config, mqtt, event_callback):
         """ Initialize for MQTT controller.
 
@@ -25,15 +90,28 @@ class HAUIMQTTController(HAUIPart):
         """
         super().__init__(app, config)
         self.mqtt = mqtt
+        self._publish = mqtt.mqtt_publish
         self.prev_cmd = None
         self._topic_prefix = None
         self._topic_cmd = None
         self._topic_recv = None
+        self._listen_handle = None
         # callback for events
         self._event_callback = event_callback
         # status publishing
         self._status_topic = "nspanel_haui/status"
-        self._status_timer = None
+        # recently received payloads, used to drop duplicates
+        self._recv_window = float(self.get("duplicate_window", 0.1))
+        self._recv_cache = OrderedDict()
+        # pending commands, sent out together after a short delay
+        self._tx_delay = float(self.get("send_delay", 0.01))
+        self._tx_pending = []
+        self._tx_handle = None
+        self._tx_lock = threading.Lock()
+        # serializes flushes so batches are published in order
+        self._flush_lock = threading.Lock()
+        # verbose logging of mqtt traffic
+        self._debug = bool(self.get("debug", False))
 
     # part
 
@@ -41,33 +119,34 @@ class HAUIMQTTController(HAUIPart):
         """ Starts the part. """
         # topics for communication with panel
         # use AppDaemon instance name (panel name from apps.yaml)
-        name = self.app.name
+        name = (self.app.name or "nspanel_haui").rstrip("/")
         self._topic_prefix = f"nspanel_haui/{name}"
-        if self._topic_prefix.endswith("/"):
-            self._topic_prefix = self._topic_prefix[:-1]
         self._topic_cmd = f"{self._topic_prefix}/cmd"
         self._topic_recv = f"{self._topic_prefix}/recv"
-        self.log(f"Using MQTT topic prefix: {self._topic_prefix}")
+        if self._debug:
+            self.log(f"Using MQTT topic prefix: {self._topic_prefix}")
         
         # Publish status to let ESPHome device know AppDaemon is available
         # The device subscribes to nspanel_haui/status to detect AppDaemon availability
+        # The status topic is shared by all panels, offline is published by the
+        # MQTT plugin on disconnect and shutdown (see appdaemon.yaml)
         self._publish_status("online")
         
-        # Republish status every 30 seconds to ensure it stays current
-        self._start_status_timer()
-        
-        # setup listener
-        self.mqtt.mqtt_subscribe(topic=self._topic_recv)
-        self.mqtt.listen_event(
-            self.callback_event, "MQTT_MESSAGE", topic=self._topic_recv
-        )
+        # setup listener, only once so messages are not dispatched twice
+        if self._listen_handle is None:
+            self.mqtt.mqtt_subscribe(topic=self._topic_recv)
+            self._listen_handle = self.mqtt.listen_event(
+                self.callback_event, "MQTT_MESSAGE", topic=self._topic_recv
+            )
     
     def stop_part(self):
         """ Stops the part. """
-        # Stop status timer
-        self._stop_status_timer()
-        # Publish offline status
-        self._publish_status("offline")
+        # Stop listening for messages
+        if self._listen_handle is not None:
+            self.mqtt.cancel_listen_event(self._listen_handle)
+            self._listen_handle = None
+        # Send out pending commands
+        self._flush_tx()
     
     def _publish_status(self, status):
         """ Publishes AppDaemon status to MQTT.
@@ -75,32 +154,97 @@ class HAUIMQTTController(HAUIPart):
         Args:
             status (str): Status value ("online" or "offline")
         """
-        self.log(f"Publishing AppDaemon status '{status}' to: {self._status_topic}")
+        if self._debug:
+            self.log(f"Publishing AppDaemon status '{status}' to: {self._status_topic}")
         try:
-            self.mqtt.mqtt_publish(self._status_topic, status, retain=True)
-            self.log(f"Successfully published status '{status}' to {self._status_topic}")
+            self._publish(self._status_topic, status, retain=True)
         except Exception as e:
             self.log(f"ERROR publishing status: {e}")
     
-    def _start_status_timer(self):
-        """ Starts timer to republish status periodically. """
-        if self._status_timer is not None:
+    def _flush_tx(self, kwargs=None):
+        """ Sends out all pending commands.
+
+        Consecutive send_command messages are merged into
+        send_commands messages to reduce the number of publishes.
+
+        Args:
+            kwargs (dict, optional): Additional arguments
+        """
+        with self._flush_lock:
+            with self._tx_lock:
+                pending = self._tx_pending
+                self._tx_pending = []
+                if self._tx_handle is not None:
+                    if kwargs is None:
+                        self.app.cancel_timer(self._tx_handle)
+                    self._tx_handle = None
+            commands = []
+            for cmd, value, payload in pending:
+                if cmd == ESP_COMMAND["send_command"]:
+                    commands.append((value, payload))
+                    continue
+                self._publish_commands(commands)
+                commands = []
+                self._publish(self._topic_cmd, payload)
+            self._publish_commands(commands)
+
+    def _publish_commands(self, commands):
+        """ Publishes a list of send_command messages.
+
+        Args:
+            commands (list): List of (command, payload) tuples
+        """
+        total_len = 0
+        chunk = []
+        for cmd, payload in commands:
+            if chunk and total_len + len(cmd) > SEND_COMMANDS_MAX_LEN:
+                self._publish_chunk(chunk)
+                chunk = []
+                total_len = 0
+            chunk.append((cmd, payload))
+            total_len += len(cmd)
+        if chunk:
+            self._publish_chunk(chunk)
+
+    def _publish_chunk(self, chunk):
+        """ Publishes a chunk of send_command messages as one message.
+
+        Args:
+            chunk (list): List of (command, payload) tuples
+        """
+        if len(chunk) == 1:
+            self._publish(self._topic_cmd, chunk[0][1])
             return
-        self._status_timer = threading.Timer(30.0, self._status_timer_callback)
-        self._status_timer.daemon = True
-        self._status_timer.start()
-    
-    def _stop_status_timer(self):
-        """ Stops the status timer. """
-        if self._status_timer is not None:
-            self._status_timer.cancel()
-            self._status_timer = None
-    
-    def _status_timer_callback(self):
-        """ Callback for status timer - republishes status. """
-        self._publish_status("online")
-        # Restart timer
-        self._start_status_timer()
+        value = _json_dumps({"commands": [cmd for cmd, _ in chunk]})
+        payload = _encode_cmd(ESP_COMMAND["send_commands"], value)
+        self._publish(self._topic_cmd, payload)
+
+    def _is_duplicate(self, payload):
+        """ Checks if the payload was already received shortly before.
+
+        Retained messages and reconnects can deliver the same payload
+        multiple times in a row. Only identical payloads received within
+        the duplicate window after the last accepted one are treated
+        as duplicates.
+
+        Args:
+            payload (str): Payload
+
+        Returns:
+            bool: True if the payload is a duplicate
+        """
+        if self._recv_window <= 0:
+            return False
+        now = time.monotonic()
+        key = hash(payload)
+        last = self._recv_cache.get(key)
+        if last is not None and now - last < self._recv_window:
+            return True
+        self._recv_cache[key] = now
+        self._recv_cache.move_to_end(key)
+        if len(self._recv_cache) > RECV_CACHE_SIZE:
+            self._recv_cache.popitem(last=False)
+        return False
 
     # public
 
@@ -115,12 +259,24 @@ class HAUIMQTTController(HAUIPart):
         """
         if cmd not in ALL_CMD:
             self.log(f"Unknown command {cmd} received." f" content: {value}")
-        cmd = json.dumps({"name": cmd, "value": value})
-        if not force and self.prev_cmd == cmd:
-            self.log(f"Dropping identical consecutive message: {cmd}")
+        # compare with previous command before serializing
+        if isinstance(value, (str, int, float, bool, type(None))):
+            key = (cmd, type(value), value)
+        else:
+            key = (cmd, type(value), repr(value))
+        if not force and self.prev_cmd == key:
+            if self._debug:
+                self.log(f"Dropping identical consecutive message: {cmd} {value}")
             return
-        self.mqtt.mqtt_publish(self._topic_cmd, cmd)
-        self.prev_cmd = cmd
+        payload = _encode_cmd(cmd, value)
+        self.prev_cmd = key
+        if self._tx_delay <= 0:
+            self._publish(self._topic_cmd, payload)
+            return
+        with self._tx_lock:
+            self._tx_pending.append((cmd, value, payload))
+            if self._tx_handle is None:
+                self._tx_handle = self.app.run_in(self._flush_tx, self._tx_delay)
 
     def callback_event(self, event_name, data, kwargs):
         """ Callback for events.
@@ -132,27 +288,33 @@ class HAUIMQTTController(HAUIPart):
         """
         if event_name != "MQTT_MESSAGE":
             return
-        
-        # Log all MQTT messages for debugging
-        topic = data.get("topic", "unknown")
         payload = data.get("payload", "")
-        
-        self.log(f"MQTT message received - Topic: {topic}, Payload: {payload[:200]}")  # Limit payload length
-        
-        if payload == "":
+        if self._debug:
+            topic = data.get("topic", "unknown")
+            self.log(f"MQTT message received - Topic: {topic}, Payload: {payload[:200]}")
+        if not payload:
+            return
+        # all messages are json objects, skip anything else without parsing
+        if payload[:1] not in ("{", b"{"):
+            self.log(f"Got invalid json: {data}")
+            return
+        if self._is_duplicate(payload):
             return
         try:
-            event = json.loads(payload)
-        except Exception:
+            msg = _json_loads(payload)
+        except ValueError:
             self.log(f"Got invalid json: {data}")
             return
-        name = event.get("name", "unknown")
-        value = event.get("value", "")
-        
-        self.log(f"Parsed MQTT event - name: {name}, value: {str(value)[:100]}")
-        
+        name = msg.get("name")
+        if not isinstance(name, str):
+            self.log(f"Got message without name: {payload}")
+            return
+        value = msg.get("value", "")
+        if self._debug:
+            self.log(f"Parsed MQTT event - name: {name}, value: {str(value)[:100]}")
         if name not in ALL_RECV:
+            # unknown messages are not handled by any part
             self.log(f"Unknown message {name} received." f" content: {value}")
+            return
         # notify about event
-        event = HAUIEvent(name, value)
-        self._event_callback(event)
\ No newline at end of file
+        self._event_callback(HAUIEvent(name, value))
\ No newline at end of file
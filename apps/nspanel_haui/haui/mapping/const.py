@@ -154,6 +154,9 @@ DEFAULT_CONFIG = {
     # mqtt related settings
     "mqtt": {
         "topic_prefix": "nspanel_haui/nspanel_haui",
+        "duplicate_window": 0.1,  # Default 0.1 sec, drop identical messages received within this time, 0 to disable
+        "send_delay": 0.01,  # Default 0.01 sec, collect commands for this time before sending them together, 0 to disable
+        "debug": False,  # Defaults to false, set to true for verbose logging of mqtt messages
     },
     # connection related settings
     "connection": {